@@ -1,22 +1,38 @@
+import asyncio
 import os
 from datetime import datetime
 from pathlib import Path
+from typing import BinaryIO, Iterator, Optional
+import shutil
+import csv
+import io
 import json 
-import pandas as pd
-from fastapi import FastAPI, Request, UploadFile, File, Form
-from fastapi.responses import HTMLResponse
+import multiprocessing
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import anyio
+from fastapi import FastAPI, Request, UploadFile, File, Form, Query, BackgroundTasks, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, JSONResponse, ORJSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
-from fastapi import HTTPException
 import uuid
 import logging
 from dotenv import load_dotenv
 
+try:
+    import orjson
+except ImportError:  # optional; stdlib json is used instead
+    orjson = None
+
 logging.basicConfig(level=logging.INFO)
 
 load_dotenv()
 
 from .storage import upload_bytes, init_database, save_metadata_to_db, get_all_uploads_with_anomalies, get_anomaly_statistics
-from .utils import redact_text, is_valid_phone, is_valid_email, detect_anomalies
+from .utils import redact_text, redact_many, is_valid_phone, is_valid_email, detect_anomalies
 
 logger = logging.getLogger("app")
 app = FastAPI()
@@ -25,38 +41,205 @@ templates = Jinja2Templates(directory="app/templates")
 # Initialize database on startup
 @app.on_event("startup")
 async def startup_event():
+    # Blocking GCS/DB/redaction work is offloaded to anyio's default thread pool
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREAD_POOL_SIZE
     init_database()
 
+@app.on_event("shutdown")
+def shutdown_event():
+    if _redact_pool is not None:
+        _redact_pool.shutdown(cancel_futures=True)
+
 RAW_BUCKET = os.getenv("GCS_RAW_BUCKET", "your-raw-data-bucket")
 PROCESSED_BUCKET = os.getenv("GCS_PROCESSED_BUCKET", "your-processed-data-bucket")
+THREAD_POOL_SIZE = int(os.getenv("THREAD_POOL_SIZE", "40"))
+# Redacted CSV output stays in memory up to this size, then spills to disk
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+# Rows redacted per redact_many call
+CSV_BATCH_ROWS = 1000
+# csv.reader rejects fields over 128 KiB by default; pandas had no such limit.
+# 2**31 - 1 rather than sys.maxsize, which overflows a C long on Windows.
+csv.field_size_limit(2**31 - 1)
+# CSVs at least this large are redacted across a process pool; below it,
+# pickling batches to worker processes costs more than it saves
+PARALLEL_REDACT_MIN_BYTES = 4 * 1024 * 1024
+# Opt-in: os.cpu_count() is the node's core count, not the container's CPU
+# quota, and every worker is a full interpreter holding batches in flight.
+# 1 keeps redaction in-process.
+REDACT_WORKERS = int(os.getenv("REDACT_WORKERS", "1"))
 logger.info("=" * 60)
 logger.info("Initializing application")
 logger.info(f"RAW_BUCKET: {RAW_BUCKET}")
 logger.info(f"PROCESSED_BUCKET: {PROCESSED_BUCKET}")
+logger.info(f"THREAD_POOL_SIZE: {THREAD_POOL_SIZE}")
+logger.info(f"REDACT_WORKERS: {REDACT_WORKERS}")
 logger.info("=" * 60)
 
+def _dumps(obj) -> bytes:
+    """Serialize to UTF-8 JSON bytes, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode("utf-8")
+
+def _spooled_size(fp: BinaryIO) -> int:
+    """Size of a spooled upload; leaves the file positioned at the start"""
+    size = fp.seek(0, os.SEEK_END)
+    fp.seek(0)
+    return size
+
+def _spool_copy(fp: BinaryIO) -> BinaryIO:
+    """Copy an upload into a spooled file owned by the caller, rewound"""
+    fp.seek(0)
+    copy = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    shutil.copyfileobj(fp, copy, SPOOL_MAX_SIZE)
+    copy.seek(0)
+    return copy
+
+_redact_pool = None
+_redact_pool_lock = threading.Lock()
+
+def _get_redact_pool() -> ProcessPoolExecutor:
+    """Process pool for CPU-bound redaction, created on first use and shared by all requests"""
+    global _redact_pool
+    with _redact_pool_lock:
+        if _redact_pool is None:
+            # spawn: forking a process that is running threads can deadlock the children
+            _redact_pool = ProcessPoolExecutor(max_workers=REDACT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _redact_pool
+
+def _redact_row_batches(batches: Iterator[list], parallel: bool) -> Iterator[tuple]:
+    """
+    Yield (rows, redacted cells) for each batch of CSV rows, in order. With
+    parallel=True, batches are redacted in the process pool, keeping at most
+    two per worker in flight so memory stays bounded.
+    """
+    if not parallel:
+        for rows in batches:
+            yield rows, redact_many([cell for row in rows for cell in row])
+        return
+    
+    pool = _get_redact_pool()
+    pending = deque()
+    for rows in batches:
+        pending.append((rows, pool.submit(redact_many, [cell for row in rows for cell in row])))
+        if len(pending) >= 2 * REDACT_WORKERS:
+            rows, future = pending.popleft()
+            yield rows, future.result()
+    while pending:
+        rows, future = pending.popleft()
+        yield rows, future.result()
+
+def _iter_redacted_csv(fp: BinaryIO, parallel: bool = False) -> Iterator[bytes]:
+    """Redact a CSV upload row by row, yielding UTF-8 output per CSV_BATCH_ROWS rows (blocking)"""
+    fp.seek(0)
+    src = io.TextIOWrapper(fp, encoding="utf-8", errors="ignore", newline="")
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    try:
+        reader = csv.reader(src)
+        # The header row is column names, not data: pass it through as pandas did
+        header = next(reader, None)
+        if header is not None:
+            writer.writerow(header)
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+        batches = iter(lambda: list(islice(reader, CSV_BATCH_ROWS)), [])
+        for rows, redacted in _redact_row_batches(batches, parallel):
+            cells = iter(redacted)
+            writer.writerows([[next(cells) for _ in row] for row in rows])
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+    finally:
+        # Don't let the wrapper close the underlying file
+        src.detach()
+
+def _redact_csv(fp: BinaryIO, parallel: bool = False) -> BinaryIO:
+    """
+    Redact a CSV upload into a spooled file, rewound and ready to upload
+    (blocking; run in the thread pool). The caller closes it.
+    """
+    out = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    try:
+        for chunk in _iter_redacted_csv(fp, parallel):
+            out.write(chunk)
+    except Exception:
+        out.close()
+        raise
+    out.seek(0)
+    return out
+
+def _redact_plain_text(fp: BinaryIO) -> str:
+    """Read and redact a non-CSV upload (blocking; run in the thread pool)"""
+    fp.seek(0)
+    return redact_text(fp.read().decode("utf-8", errors="ignore"))
+
+def _iter_redacted_text(fp: BinaryIO) -> Iterator[bytes]:
+    """Lazy form of _redact_plain_text for streaming responses"""
+    yield _redact_plain_text(fp).encode("utf-8")
+
+def _tee(chunks: Iterator[bytes], sink: BinaryIO, state: dict) -> Iterator[bytes]:
+    """Yield chunks while also writing them to sink; marks state["complete"] at the end"""
+    for chunk in chunks:
+        sink.write(chunk)
+        yield chunk
+    state["complete"] = True
+
+def _upload_streamed(source: BinaryIO, sink: BinaryIO, state: dict, processed_key: str, content_type: str):
+    """Background task: persist a processed file once it has been streamed to the client"""
+    try:
+        if state.get("complete"):
+            sink.seek(0)
+            upload_bytes(bucket=PROCESSED_BUCKET, blob_name=processed_key, data=sink, content_type=content_type)
+            logger.info(f"Processed file uploaded to {PROCESSED_BUCKET}/{processed_key}")
+        else:
+            logger.warning(f"Streaming of {processed_key} did not complete; processed file not uploaded")
+    finally:
+        source.close()
+        sink.close()
+
+async def _persist_upload(file: UploadFile, raw_key: str, meta_key: str, metadata: dict, *extra_writes):
+    """Upload the raw file and metadata (DB + JSON), plus any extra writes, concurrently"""
+    await file.seek(0)
+    # Wait for every write before raising: callers close the files the others
+    # are still reading as soon as this returns
+    results = await asyncio.gather(
+        run_in_threadpool(upload_bytes, bucket=RAW_BUCKET, blob_name=raw_key, data=file.file, content_type=file.content_type or "application/octet-stream"),
+        run_in_threadpool(save_metadata_to_db, metadata),
+        run_in_threadpool(upload_bytes, bucket=RAW_BUCKET, blob_name=meta_key, data=_dumps(metadata), content_type="application/json"),
+        *extra_writes,
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    logger.info(f"Uploaded raw file to {RAW_BUCKET}/{raw_key}")
+
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 @app.post("/upload")
 async def upload(
     request: Request,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     name: str = Form(...),
     email: str = Form(...),
     phone: str = Form(...),
+    download: bool = Form(False),
 ):
     ts = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
     upload_id = uuid.uuid4().hex
     logger.info(f"Upload started: id={upload_id}, file={file.filename}")
     raw_key = f"raw/{upload_id}/{ts}-{file.filename}"
-    content = await file.read()
-    logger.info(f"File read successfully: size={len(content)} bytes")
-    upload_bytes(bucket=RAW_BUCKET, blob_name=raw_key, data=content, content_type=file.content_type or "application/octet-stream")
-    logger.info(f"Uploaded raw file to {RAW_BUCKET}/{raw_key}")
+    # UploadFile is already spooled to disk by Starlette; stream it instead of reading it into memory
+    filesize = await run_in_threadpool(_spooled_size, file.file)
+    logger.info(f"File received successfully: size={filesize} bytes")
     
     safe_name = Path(file.filename).name
     processed_key = f"processed/{ts}-{upload_id}-redacted-{safe_name}"
+    meta_key = f"raw/{upload_id}/{ts}-{Path(safe_name).stem}.json"
     
     # Detect anomalies in user input
     anomaly_check = detect_anomalies(name, email, phone)
@@ -67,7 +250,7 @@ async def upload(
         "email": email,
         "phone": phone,
         "filename": safe_name,
-        "filesize_bytes": len(content),
+        "filesize_bytes": filesize,
         "filetype": file.content_type or "application/octet-stream",
         "uploaded_utc": ts,
         "phone_valid": is_valid_phone(phone),
@@ -82,27 +265,56 @@ async def upload(
     if anomaly_check["has_anomaly"]:
         logger.warning(f"Anomalies detected for upload {upload_id}: {anomaly_check['anomaly_details']}")
     
-    # Save metadata to database
-    save_metadata_to_db(metadata)
+    is_csv = file.filename.lower().endswith(".csv")
+    parallel = REDACT_WORKERS > 1 and filesize >= PARALLEL_REDACT_MIN_BYTES
+    processed_type = "text/csv" if is_csv else "text/plain"
     
-    meta_key = f"raw/{upload_id}/{ts}-{Path(safe_name).stem}.json"
-    upload_bytes(bucket=RAW_BUCKET, blob_name=meta_key, data=json.dumps(metadata).encode("utf-8"), content_type="application/json")
+    if download:
+        # Stream the redacted file back and persist it in the background once sent.
+        # The form's spooled file is closed when this handler returns, so redact from a copy,
+        # made only once the writes succeeded so a failed upload leaves nothing open.
+        await _persist_upload(file, raw_key, meta_key, metadata)
+        source = await run_in_threadpool(_spool_copy, file.file)
+        sink = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        state = {}
+        if is_csv:
+            chunks = _iter_redacted_csv(source, parallel)
+        else:
+            chunks = _iter_redacted_text(source)
+        background_tasks.add_task(_upload_streamed, source, sink, state, processed_key, processed_type)
+        logger.info(f"Streaming processed file for upload {upload_id}")
+        return StreamingResponse(
+            _tee(chunks, sink, state),
+            media_type=processed_type,
+            headers={"Content-Disposition": f'attachment; filename="redacted-{safe_name}"'},
+        )
+    
+    # Redact first: it reads the same spooled file the raw upload streams from
+    processed_file = None
+    processing_error = None
     try:
-        if file.filename.lower().endswith(".csv"):
-            from io import StringIO
-            df = pd.read_csv(StringIO(content.decode("utf-8", errors="ignore")))
-            for col in df.columns:
-                df[col] = df[col].astype(str).map(redact_text)
-            processed_bytes = df.to_csv(index=False).encode("utf-8")
-            upload_bytes(bucket=PROCESSED_BUCKET, blob_name=processed_key, data=processed_bytes, content_type="text/csv")
-            logger.info(f"Processed CSV uploaded to {PROCESSED_BUCKET}/{processed_key}")
+        if is_csv:
+            processed_file = await run_in_threadpool(_redact_csv, file.file, parallel)
         else:
-            redacted = redact_text(content.decode("utf-8", errors="ignore"))
-            upload_bytes(bucket=PROCESSED_BUCKET, blob_name=processed_key, data=redacted.encode("utf-8"), content_type="text/plain")
-            logger.info(f"Processed text file uploaded to {PROCESSED_BUCKET}/{processed_key}")
+            redacted = await run_in_threadpool(_redact_plain_text, file.file)
+            processed_file = io.BytesIO(redacted.encode("utf-8"))
     except Exception as e:
         logger.exception(f"Error while processing file {file.filename}: {e}")
-        raise HTTPException(status_code=500, detail=f"Processing failed: {e}")
+        processing_error = e
+    
+    # Raw file, metadata (DB + JSON) and processed file are independent; send them concurrently
+    writes = []
+    if processed_file is not None:
+        writes.append(run_in_threadpool(upload_bytes, bucket=PROCESSED_BUCKET, blob_name=processed_key, data=processed_file, content_type=processed_type))
+    try:
+        await _persist_upload(file, raw_key, meta_key, metadata, *writes)
+    finally:
+        if processed_file is not None:
+            processed_file.close()
+    
+    if processing_error is not None:
+        raise HTTPException(status_code=500, detail=f"Processing failed: {processing_error}")
+    logger.info(f"Processed file uploaded to {PROCESSED_BUCKET}/{processed_key}")
         
     logger.info(f"Upload completed successfully: id={upload_id}")
     return templates.TemplateResponse("success.html", {
@@ -114,25 +326,47 @@ async def upload(
         "processed_bucket": PROCESSED_BUCKET
     })
 
+async def _load_report(limit: int, before: Optional[datetime], before_id: Optional[int]):
+    """Run the (synchronous) dashboard queries in the thread pool, concurrently"""
+    uploads, stats = await asyncio.gather(
+        run_in_threadpool(get_all_uploads_with_anomalies, limit=limit, before=before, before_id=before_id),
+        run_in_threadpool(get_anomaly_statistics),
+    )
+    # Keyset cursor (query parameters) for the next (older) page
+    next_before = None
+    if len(uploads) == limit:
+        next_before = {"before": uploads[-1]["created_at"], "before_id": uploads[-1]["id"]}
+    return uploads, stats, next_before
+
 @app.get("/report", response_class=HTMLResponse)
-async def anomaly_report(request: Request):
+async def anomaly_report(
+    request: Request,
+    limit: int = Query(100, ge=1, le=500),
+    before: Optional[datetime] = None,
+    before_id: Optional[int] = None,
+):
     """Anomaly Detection Dashboard"""
-    uploads = get_all_uploads_with_anomalies(limit=100)
-    stats = get_anomaly_statistics()
+    uploads, stats, next_before = await _load_report(limit=limit, before=before, before_id=before_id)
     
     return templates.TemplateResponse("report.html", {
         "request": request,
         "uploads": uploads,
-        "stats": stats
+        "stats": stats,
+        "limit": limit,
+        "next_before": next_before
     })
 
-@app.get("/report/json")
-async def anomaly_report_json():
+@app.get("/report/json", response_class=ORJSONResponse if orjson is not None else JSONResponse)
+async def anomaly_report_json(
+    limit: int = Query(100, ge=1, le=500),
+    before: Optional[datetime] = None,
+    before_id: Optional[int] = None,
+):
     """API endpoint for anomaly data"""
-    uploads = get_all_uploads_with_anomalies(limit=100)
-    stats = get_anomaly_statistics()
+    uploads, stats, next_before = await _load_report(limit=limit, before=before, before_id=before_id)
     
     return {
         "uploads": uploads,
-        "statistics": stats
+        "statistics": stats,
+        "next_before": next_before
     }
@@ -1,38 +1,100 @@
 import os
-from typing import Dict, Any
+import io
+import shutil
+import stat
+import tempfile
+import threading
+from functools import lru_cache
+from typing import Any, BinaryIO, Dict, List, Optional, Union
 from datetime import datetime
 import logging
 from pathlib import Path
+from cachetools import TTLCache, cached
 from google.cloud import storage
 from google.auth.exceptions import DefaultCredentialsError
-from sqlalchemy import create_engine, Column, Integer, String, Text, JSON, DateTime, func, desc, and_
+from sqlalchemy import create_engine, Column, Integer, String, Text, JSON, DateTime, Boolean, Index, func, desc, case, inspect, text, tuple_
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from typing import List, Optional
 
 logger = logging.getLogger(__name__)
+
+# Streamed uploads are sent to GCS as resumable uploads in chunks of this size
+# (must be a multiple of 256 KiB), keeping memory bounded regardless of file size.
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+@lru_cache(maxsize=1)
 def gcs_client():
-    # Only used when USE_LOCAL_STORAGE is not true
+    # Only used when USE_LOCAL_STORAGE is not true.
+    # Cached so credentials and the HTTP session are reused across uploads.
     return storage.Client(project=os.getenv("GCP_PROJECT_ID"))
 
-def upload_bytes(bucket: str, blob_name: str, data: bytes, content_type: str = "application/octet-stream"):
+@lru_cache(maxsize=32)
+def gcs_bucket(name: str):
+    return gcs_client().bucket(name)
+
+def _real_fileno(fp: BinaryIO) -> Optional[int]:
+    """File descriptor backing fp, or None for in-memory files"""
+    # Asking an unrolled SpooledTemporaryFile for its fileno would force it to
+    # disk. There is no public way to tell; if the private flag ever goes away,
+    # treat the spool as in memory rather than roll it over.
+    if isinstance(fp, tempfile.SpooledTemporaryFile) and not getattr(fp, "_rolled", False):
+        return None
+    try:
+        return fp.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
+def _copy_to_path(data: BinaryIO, dest: Path):
+    """
+    Copy data from its current position to dest. When data is backed by a
+    regular file, os.sendfile moves the bytes in the kernel without copying
+    them through Python.
+    """
+    src_fd = _real_fileno(data)
+    # Pipes and sockets have no size to copy up to; stream those instead
+    if src_fd is not None and not stat.S_ISREG(os.fstat(src_fd).st_mode):
+        src_fd = None
+    with dest.open("wb") as out:
+        if src_fd is None or not hasattr(os, "sendfile"):
+            shutil.copyfileobj(data, out, UPLOAD_CHUNK_SIZE)
+            return
+        data.flush()
+        offset = data.tell()
+        end = os.fstat(src_fd).st_size
+        while offset < end:
+            sent = os.sendfile(out.fileno(), src_fd, offset, end - offset)
+            if sent == 0:
+                break
+            offset += sent
+        data.seek(offset)
+
+def upload_bytes(bucket: str, blob_name: str, data: Union[bytes, BinaryIO], content_type: str = "application/octet-stream"):
     """
-    If USE_LOCAL_STORAGE=true,
+    If USE_LOCAL_STORAGE=true, write under ./local_uploads.
     Otherwise, upload to GCS.
+    `data` may be bytes or a binary file-like object, which is streamed
+    from its current position in UPLOAD_CHUNK_SIZE chunks.
     """
     use_local = os.getenv("USE_LOCAL_STORAGE", "").lower() == "true"
     if use_local:
         base = Path("local_uploads") / bucket
         dest = base / blob_name
         dest.parent.mkdir(parents=True, exist_ok=True)
-        dest.write_bytes(data)
+        if isinstance(data, (bytes, bytearray)):
+            dest.write_bytes(data)
+        else:
+            _copy_to_path(data, dest)
         return f"local://{dest.as_posix()}"
     else:
         try:
-            client = gcs_client()
-            b = client.bucket(bucket)
+            b = gcs_bucket(bucket)
             blob = b.blob(blob_name)
-            blob.upload_from_string(data, content_type=content_type)
+            if isinstance(data, (bytes, bytearray)):
+                blob.upload_from_string(data, content_type=content_type)
+            else:
+                blob.chunk_size = UPLOAD_CHUNK_SIZE
+                blob.upload_from_file(data, content_type=content_type)
             return f"gs://{bucket}/{blob_name}"
         except DefaultCredentialsError as e:
             # Make the error clear if user forgot creds
@@ -44,6 +106,13 @@ def upload_bytes(bucket: str, blob_name: str, data: bytes, content_type: str = "
 
 Base = declarative_base()
 
+# SQLite fills created_at with CURRENT_TIMESTAMP ('YYYY-MM-DD HH:MM:SS', compared
+# as text); bind cursor values in the same format so equal timestamps compare equal
+CREATED_AT_TYPE = DateTime(timezone=True).with_variant(
+    sqlite.DATETIME(storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"),
+    "sqlite",
+)
+
 class MetadataRecord(Base):
     __tablename__ = "file_metadata"
     
@@ -56,17 +125,70 @@ class MetadataRecord(Base):
     filesize_bytes = Column(Integer)
     filetype = Column(String(100))
     uploaded_utc = Column(String(20))
-    phone_valid = Column(String(10))
-    email_valid = Column(String(10))  
-    anomaly = Column(String(10))      
+    phone_valid = Column(Boolean)
+    email_valid = Column(Boolean)
+    anomaly = Column(Boolean, index=True)
     anomaly_details = Column(JSON)    
     raw_key = Column(Text)
     processed_key = Column(Text)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(CREATED_AT_TYPE, server_default=func.now())
+
+    # Keyset index for the report: serves both the (created_at, id) cursor
+    # filter and the ORDER BY created_at DESC, id DESC without a sort
+    __table_args__ = (Index("ix_file_metadata_created_at_id", created_at, id),)
 
 # Database connection
 engine = None
 SessionLocal = None
+# Connections per process: at most DB_POOL_SIZE + DB_MAX_OVERFLOW. Keep the
+# total across processes/replicas under the server's limit (db-f1-micro, as
+# created by scripts/setup-cloudsql.sh, allows 25); past the pool, sessions
+# wait for a free connection instead of being refused by the server.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+
+# Dashboard queries are cached briefly so a polled /report doesn't hit the
+# database on every refresh; saving new metadata clears them.
+REPORT_CACHE_TTL = int(os.getenv("REPORT_CACHE_TTL", "10"))
+_uploads_cache = TTLCache(maxsize=64, ttl=REPORT_CACHE_TTL)
+_stats_cache = TTLCache(maxsize=1, ttl=REPORT_CACHE_TTL)
+_report_cache_lock = threading.Lock()
+
+def _clear_report_caches():
+    with _report_cache_lock:
+        _uploads_cache.clear()
+        _stats_cache.clear()
+
+BOOLEAN_COLUMNS = ("phone_valid", "email_valid", "anomaly")
+
+class LegacySchemaError(RuntimeError):
+    """file_metadata still has the old string flag columns and can't be migrated automatically"""
+
+def _migrate_boolean_columns(engine):
+    """
+    Tables created before the flags became Boolean store them as 'True'/'False'
+    strings. Convert them in place (PostgreSQL only); a no-op once the columns
+    are boolean. Other databases must be migrated by hand: writing booleans
+    into the old columns and reading 'False' back as truthy would corrupt the
+    dashboard, so raise LegacySchemaError instead.
+    """
+    columns = {c["name"]: c["type"] for c in inspect(engine).get_columns(MetadataRecord.__tablename__)}
+    legacy = [name for name in BOOLEAN_COLUMNS if not isinstance(columns.get(name), Boolean)]
+    if not legacy:
+        return
+    if engine.dialect.name != "postgresql":
+        raise LegacySchemaError(
+            f"Columns {legacy} of {MetadataRecord.__tablename__} are not boolean; "
+            f"migrate them manually for {engine.dialect.name}"
+        )
+    
+    with engine.begin() as conn:
+        for name in legacy:
+            conn.execute(text(
+                f"ALTER TABLE file_metadata ALTER COLUMN {name} TYPE BOOLEAN "
+                f"USING CASE {name} WHEN 'True' THEN true WHEN 'False' THEN false END"
+            ))
+    logger.info(f"Migrated columns {legacy} to BOOLEAN")
 
 def init_database():
     global engine, SessionLocal
@@ -77,12 +199,28 @@ def init_database():
         return
     
     try:
-        engine = create_engine(database_url)
+        # Keep a warm pool of authenticated connections; pre-ping drops ones the server closed
+        engine = create_engine(
+            database_url,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_pre_ping=True,
+            pool_recycle=1800,
+        )
         SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
         
         # Create tables
         Base.metadata.create_all(bind=engine)
+        _migrate_boolean_columns(engine)
+        # create_all skips existing tables; add indexes introduced since
+        for index in MetadataRecord.__table__.indexes:
+            index.create(bind=engine, checkfirst=True)
+        # Superseded by ix_file_metadata_created_at_id
+        Index("ix_file_metadata_created_at", MetadataRecord.created_at).drop(bind=engine, checkfirst=True)
         logger.info("Database initialized successfully")
+    except LegacySchemaError:
+        # Refuse to start rather than misread the anomaly flags
+        raise
     except Exception as e:
         logger.error(f"Database initialization failed: {e}")
 
@@ -93,7 +231,6 @@ def save_metadata_to_db(metadata: Dict[str, Any]) -> bool:
         return False
     
     try:
-        db = SessionLocal()
         record = MetadataRecord(
             upload_id=metadata.get("upload_id"),
             name=metadata.get("name"),
@@ -103,78 +240,100 @@ def save_metadata_to_db(metadata: Dict[str, Any]) -> bool:
             filesize_bytes=metadata.get("filesize_bytes"),
             filetype=metadata.get("filetype"),
             uploaded_utc=metadata.get("uploaded_utc"),
-            phone_valid=str(metadata.get("phone_valid")),
-            email_valid=str(metadata.get("email_valid")),  
-            anomaly=str(metadata.get("anomaly")),           
+            phone_valid=metadata.get("phone_valid"),
+            email_valid=metadata.get("email_valid"),
+            anomaly=metadata.get("anomaly"),
             anomaly_details=metadata.get("anomaly_details"), 
             raw_key=metadata.get("raw_key"),
             processed_key=metadata.get("processed_key")
         )
         
-        db.add(record)
-        db.commit()
-        db.close()
+        # Commits on exit and returns the connection to the pool
+        with SessionLocal.begin() as db:
+            db.add(record)
+        _clear_report_caches()
         logger.info(f"Metadata saved to database for upload_id: {metadata.get('upload_id')}")
         return True
     except Exception as e:
         logger.error(f"Failed to save metadata to database: {e}")
         return False
 
-def get_all_uploads_with_anomalies(limit: int = 100) -> List[Dict[str, Any]]:
-    """Get all uploads with anomaly information for dashboard"""
+@cached(_uploads_cache, lock=_report_cache_lock)
+def _query_uploads(limit: int, before: Optional[datetime], before_id: Optional[int]) -> List[Dict[str, Any]]:
+    with SessionLocal() as db:
+        query = db.query(MetadataRecord)
+        if before is not None and before_id is not None:
+            # id breaks ties between rows created in the same instant
+            query = query.filter(tuple_(MetadataRecord.created_at, MetadataRecord.id) < (before, before_id))
+        elif before is not None:
+            query = query.filter(MetadataRecord.created_at < before)
+        records = query.order_by(desc(MetadataRecord.created_at), desc(MetadataRecord.id)).limit(limit).all()
+    
+    result = []
+    for record in records:
+        result.append({
+            "id": record.id,
+            "upload_id": record.upload_id,
+            "name": record.name,
+            "email": record.email,
+            "phone": record.phone,
+            "filename": record.filename,
+            "filesize_bytes": record.filesize_bytes,
+            "filetype": record.filetype,
+            "uploaded_utc": record.uploaded_utc,
+            "phone_valid": bool(record.phone_valid),
+            "email_valid": bool(record.email_valid),
+            "anomaly": bool(record.anomaly),
+            "anomaly_details": record.anomaly_details or [],
+            "created_at": record.created_at.isoformat() if record.created_at else None
+        })
+    return result
+
+def get_all_uploads_with_anomalies(
+    limit: int = 100, before: Optional[datetime] = None, before_id: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Get uploads with anomaly information for dashboard, newest first.
+    Pass the created_at and id of the last row seen as `before` / `before_id`
+    to page (keyset pagination on the created_at index, no OFFSET scan).
+    """
     if SessionLocal is None:
         return []
     
     try:
-        db = SessionLocal()
-        records = db.query(MetadataRecord).order_by(desc(MetadataRecord.created_at)).limit(limit).all()
-        db.close()
-        
-        result = []
-        for record in records:
-            result.append({
-                "id": record.id,
-                "upload_id": record.upload_id,
-                "name": record.name,
-                "email": record.email,
-                "phone": record.phone,
-                "filename": record.filename,
-                "filesize_bytes": record.filesize_bytes,
-                "filetype": record.filetype,
-                "uploaded_utc": record.uploaded_utc,
-                "phone_valid": record.phone_valid == "True",
-                "email_valid": record.email_valid == "True",
-                "anomaly": record.anomaly == "True",
-                "anomaly_details": record.anomaly_details or [],
-                "created_at": record.created_at.isoformat() if record.created_at else None
-            })
-        return result
+        return _query_uploads(limit, before, before_id)
     except Exception as e:
         logger.error(f"Failed to get uploads with anomalies: {e}")
         return []
 
+@cached(_stats_cache, lock=_report_cache_lock)
+def _query_anomaly_statistics() -> Dict[str, Any]:
+    with SessionLocal() as db:
+        # One scan of file_metadata instead of a COUNT(*) per statistic
+        row = db.query(
+            func.count(MetadataRecord.id).label("total_uploads"),
+            func.sum(case((MetadataRecord.anomaly.is_(True), 1), else_=0)).label("total_anomalies"),
+            func.sum(case((MetadataRecord.email_valid.is_(False), 1), else_=0)).label("invalid_emails"),
+            func.sum(case((MetadataRecord.phone_valid.is_(False), 1), else_=0)).label("invalid_phones"),
+        ).one()
+    
+    total_uploads = row.total_uploads or 0
+    total_anomalies = row.total_anomalies or 0
+    return {
+        "total_uploads": total_uploads,
+        "total_anomalies": total_anomalies,
+        "invalid_emails": row.invalid_emails or 0,
+        "invalid_phones": row.invalid_phones or 0,
+        "anomaly_rate": round((total_anomalies / total_uploads * 100) if total_uploads > 0 else 0, 2)
+    }
+
 def get_anomaly_statistics() -> Dict[str, Any]:
     """Get statistics about anomalies for dashboard"""
     if SessionLocal is None:
         return {}
     
     try:
-        db = SessionLocal()
-        
-        total_uploads = db.query(MetadataRecord).count()
-        total_anomalies = db.query(MetadataRecord).filter(MetadataRecord.anomaly == "True").count()
-        invalid_emails = db.query(MetadataRecord).filter(MetadataRecord.email_valid == "False").count()
-        invalid_phones = db.query(MetadataRecord).filter(MetadataRecord.phone_valid == "False").count()
-        
-        db.close()
-        
-        return {
-            "total_uploads": total_uploads,
-            "total_anomalies": total_anomalies,
-            "invalid_emails": invalid_emails,
-            "invalid_phones": invalid_phones,
-            "anomaly_rate": round((total_anomalies / total_uploads * 100) if total_uploads > 0 else 0, 2)
-        }
+        return _query_anomaly_statistics()
     except Exception as e:
         logger.error(f"Failed to get anomaly statistics: {e}")
         return {}
@@ -1,6 +1,23 @@
 import re
+import threading
+import unicodedata
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
 
-EMAIL_RE = re.compile(r"\b[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}\b")
+try:
+    import hyperscan  # type: ignore[import-not-found,import-untyped]
+except ImportError:  # optional accelerator; redact_text falls back to RE2 or a plain scan
+    hyperscan = None  # type: ignore[assignment]
+
+try:
+    import re2  # type: ignore[import-not-found,import-untyped]
+except ImportError:  # optional; without it non-Hyperscan input is scanned without a prescan
+    re2 = None
+
+_EMAIL_LOCAL = r"[a-zA-Z0-9._%+-]"
+_EMAIL_DOMAIN = r"[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}\b"
+
+EMAIL_RE = re.compile(rf"\b{_EMAIL_LOCAL}+@{_EMAIL_DOMAIN}")
 
 SSN_RE = re.compile(r"\b\d{3}-\d{2}-\d{4}\b")
 
@@ -29,44 +46,284 @@ PHONE_RE = re.compile(
     re.VERBOSE,
 )
 
-MASTER = re.compile(
-    rf"""(
-        (?P<email>{EMAIL_RE.pattern})
-      | (?P<ssn>{SSN_RE.pattern})
-      | (?P<dob>{DOB_RE.pattern})
-      | (?P<cc>{CC_RE_FLEX.pattern})
-      | (?P<phone>{PHONE_RE.pattern})
-    )""",
-    re.VERBOSE,
+# Alternatives in priority order: at a given position the first that matches wins
+_PII_PATTERNS = {
+    "email": EMAIL_RE,
+    "ssn": SSN_RE,
+    "dob": DOB_RE,
+    "cc": CC_RE_FLEX,
+    "phone": PHONE_RE,
+}
+
+
+def _compile_union(*names: str) -> re.Pattern:
+    alternatives = " | ".join(f"(?P<{name}>{_PII_PATTERNS[name].pattern})" for name in names)
+    return re.compile(f"({alternatives})", re.VERBOSE)
+
+
+MASTER = _compile_union("email", "ssn", "dob", "cc", "phone")
+
+# Email is the only pattern that can match without a digit, and it needs an '@'.
+# Text without '@' can skip the email alternative; text without either has no PII.
+_MASTER_NO_EMAIL = _compile_union("ssn", "dob", "cc", "phone")
+_ANY_DIGIT_RE = re.compile(r"\d")
+
+# Hyperscan cannot compile lookarounds, so PHONE_RE is scanned without its
+# (?<!\d)/(?!\d) guards. \s also gains \x1c-\x1f, which Python's \s matches
+# in str patterns. Both changes only widen the match set, which is all the
+# prescan below needs.
+_HS_PHONE_PATTERN = (
+    r"(?:\+?\d{1,3}[\s\x1c-\x1f\-.]?)?"
+    r"(?:\(?\d{2,4}\)?[\s\x1c-\x1f\-.]?)?"
+    r"(?:\d[\s\x1c-\x1f\-.]?){6,14}\d"
 )
 
+
+def _build_hs_database():
+    # Emails are found by _email_runs; only the bounded alternatives need a prescan
+    expressions = [SSN_RE.pattern, DOB_RE.pattern, CC_RE_FLEX.pattern, _HS_PHONE_PATTERN]
+    db = hyperscan.Database(mode=hyperscan.HS_MODE_BLOCK)
+    db.compile(
+        expressions=[e.encode("ascii") for e in expressions],
+        ids=list(range(len(expressions))),
+        elements=len(expressions),
+        flags=[hyperscan.HS_FLAG_SOM_LEFTMOST] * len(expressions),
+    )
+    return db
+
+
+_HS_DB: Any = _build_hs_database() if hyperscan is not None else None
+# Hyperscan scratch space must not be shared between concurrent scans
+_hs_local = threading.local()
+
+
+def _hs_scratch():
+    scratch = getattr(_hs_local, "scratch", None)
+    if scratch is None:
+        scratch = _hs_local.scratch = hyperscan.Scratch(_HS_DB)
+    return scratch
+
+
+def _re2_relaxed(pattern: str) -> str:
+    r"""
+    Widen a pattern into one RE2 can compile that matches everywhere the
+    original does: drop \b and digit lookarounds (unsupported or ASCII-only
+    in RE2) and spell out Python's Unicode \d and \s (only used inside
+    character classes here).
+    """
+    for guard in (r"\b", r"(?<!\d)", r"(?!\d)"):
+        pattern = pattern.replace(guard, "")
+    return pattern.replace(r"\d", r"\p{Nd}").replace(r"\s", r"\s\v\x1c-\x1f\x85\p{Z}")
+
+
+_RE2_PRESCAN: Any = (
+    re2.compile("|".join(
+        f"(?:{_re2_relaxed(p)})"
+        for p in (SSN_RE.pattern, DOB_RE.pattern, CC_RE_FLEX.pattern, _HS_PHONE_PATTERN)
+    ).encode("utf-8"))
+    if re2 is not None else None
+)
+
+
+def _redact_match(m: re.Match) -> str:
+    g = m.groupdict()
+
+    if g.get("email"):
+        return "[REDACTED_EMAIL]"
+
+    if g.get("ssn") or g.get("dob") or g.get("cc"):
+        return m.group(0)
+
+    if g.get("phone"):
+        return "[REDACTED_PHONE]"
+
+    return m.group(0)
+
+
+# EMAIL_RE is the only unbounded alternative, and Python's regex engine retries
+# it from every word boundary of a long run of address characters, rescanning
+# the rest of the run each time. Whether it matches only depends on the '@'
+# that ends the run, so each '@' is checked once instead.
+_EMAIL_RUN_RE = re.compile(rf"(?<!{_EMAIL_LOCAL}){_EMAIL_LOCAL}*@")
+_EMAIL_DOMAIN_RE = re.compile(rf"@{_EMAIL_DOMAIN}")
+_WORD_BOUNDARY_RE = re.compile(r"\b")
+
+
+def _email_runs(text: str) -> Iterator[Tuple[int, int, int]]:
+    r"""
+    Yield (run_start, at, end) for each '@' that has a valid domain after it.
+    EMAIL_RE matches at q exactly when run_start <= q < at and \b holds at q,
+    and the match then ends at `end`.
+    """
+    for run in _EMAIL_RUN_RE.finditer(text):
+        at = run.end() - 1
+        domain = _EMAIL_DOMAIN_RE.match(text, at)
+        if domain is not None:
+            yield run.start(), at, domain.end()
+
+
+def _redact_spans(text: str, has_at: bool, search_other: Callable[[int], Optional[re.Match]]) -> str:
+    """
+    Same result as MASTER.sub(_redact_match, text), in linear time.
+    Emails come from _email_runs; the other (bounded-length) alternatives
+    from search_other(pos), which must return _MASTER_NO_EMAIL's leftmost
+    match at or after pos. It is only called again once pos passes its last
+    result, so it can keep state between calls.
+    """
+    runs = _email_runs(text) if has_at else iter(())
+    run = next(runs, None)
+    email_start = None  # leftmost EMAIL_RE match start at or after pos, within `run`
+    other = None
+    searched = False
+
+    out = []
+    pos = 0
+    while True:
+        while run is not None and (email_start is None or email_start < pos):
+            lo = max(run[0], pos)
+            boundary = _WORD_BOUNDARY_RE.search(text, lo, run[1]) if lo < run[1] else None
+            if boundary is not None and boundary.start() < run[1]:
+                email_start = boundary.start()
+            else:
+                run = next(runs, None)
+                email_start = None
+        if not searched or (other is not None and other.start() < pos):
+            other = search_other(pos)
+            searched = True
+
+        # At a given position MASTER tries the email alternative first
+        if run is not None and email_start is not None and (other is None or email_start <= other.start()):
+            out.append(text[pos:email_start])
+            out.append("[REDACTED_EMAIL]")
+            pos = run[2]
+        elif other is not None:
+            out.append(text[pos:other.start()])
+            out.append(_redact_match(other))
+            pos = other.end()
+        else:
+            break
+    out.append(text[pos:])
+    return "".join(out)
+
+
+def _redact_hyperscan(text: str, has_at: bool = True) -> str:
+    """
+    Same result as MASTER.sub(_redact_match, text) for ASCII text.
+    One Hyperscan pass finds every candidate span; _MASTER_NO_EMAIL then only
+    runs from the earliest position a real match could start, skipping
+    PII-free stretches entirely.
+    """
+    spans = []
+
+    def on_match(_id, start, end, _flags, _ctx):
+        spans.append((end, start))
+
+    _HS_DB.scan(text.encode("ascii"), match_event_handler=on_match, scratch=_hs_scratch())
+    if not spans and not has_at:
+        return text
+    spans.sort()
+
+    # floor[i]: lowest start among candidates ending at or after spans[i]
+    floor = [0] * len(spans)
+    lowest = len(text)
+    for i in range(len(spans) - 1, -1, -1):
+        lowest = min(lowest, spans[i][1])
+        floor[i] = lowest
+
+    i = 0
+
+    def search_other(pos: int) -> Optional[re.Match]:
+        nonlocal i
+        while i < len(spans) and spans[i][0] <= pos:
+            i += 1
+        if i == len(spans):
+            return None
+        return _MASTER_NO_EMAIL.search(text, max(pos, floor[i]))
+
+    return _redact_spans(text, has_at, search_other)
+
+
+def _redact_re2(text: str, has_at: bool = True) -> str:
+    """
+    Same result as MASTER.sub(_redact_match, text), for any text.
+    RE2 finds, in linear time, the next position a non-email match could
+    start, so PII-free stretches are skipped before _MASTER_NO_EMAIL runs.
+    """
+    try:
+        data = text.encode("utf-8")
+    except UnicodeEncodeError:  # lone surrogates
+        return _redact_spans(text, has_at, lambda pos: _MASTER_NO_EMAIL.search(text, pos))
+
+    # RE2 scans the UTF-8 bytes (searching a str re-encodes it on every call);
+    # walk a byte/char offset pair forward to translate between the two.
+    byte_off = char_off = 0
+
+    def search_other(pos: int) -> Optional[re.Match]:
+        nonlocal byte_off, char_off
+        byte_off += len(text[char_off:pos].encode("utf-8"))
+        char_off = pos
+        candidate = _RE2_PRESCAN.search(data, byte_off)
+        if candidate is None:
+            return None
+        char_off += len(data[byte_off:candidate.start()].decode("utf-8"))
+        byte_off = candidate.start()
+        return _MASTER_NO_EMAIL.search(text, char_off)
+
+    return _redact_spans(text, has_at, search_other)
+
+
 def redact_text(text: str) -> str:
     if not isinstance(text, str):
         text = str(text)
 
-    def repl(m: re.Match) -> str:
-        g = m.groupdict()
+    has_at = "@" in text
+    if not has_at and _ANY_DIGIT_RE.search(text) is None:
+        return text
 
-        if g.get("email"):
-            return "[REDACTED_EMAIL]"
+    if _HS_DB is not None and text.isascii():
+        return _redact_hyperscan(text, has_at)
+    if _RE2_PRESCAN is not None:
+        return _redact_re2(text, has_at)
+    return _redact_spans(text, has_at, lambda pos: _MASTER_NO_EMAIL.search(text, pos))
 
-        if g.get("ssn") or g.get("dob") or g.get("cc"):
-            return m.group(0)
 
-        if g.get("phone"):
-            return "[REDACTED_PHONE]"
+# None of the PII patterns can match across NUL, and it acts like a string
+# edge for \b and the digit lookarounds, so joined cells redact independently.
+_CELL_SEP = "\x00"
 
-        return m.group(0)
 
-    return MASTER.sub(repl, text)
+def redact_many(values) -> list:
+    """Redact a batch of strings (e.g. CSV cells) in one pass over their concatenation"""
+    values = [v if isinstance(v, str) else str(v) for v in values]
+    if not values:
+        return []
+    joined = _CELL_SEP.join(values)
+    if joined.count(_CELL_SEP) != len(values) - 1:
+        # a value already contains the separator; redact one by one
+        return [redact_text(v) for v in values]
+    return redact_text(joined).split(_CELL_SEP)
+
+
+_NON_DIGIT_RE = re.compile(r"\D")
+
+INVALID_PHONE_PATTERNS = frozenset({
+    '0000000000', '1111111111', '2222222222', '3333333333',
+    '4444444444', '5555555555', '6666666666', '7777777777',
+    '8888888888', '9999999999', '1234567890', '0987654321'
+})
 
 
 def is_valid_phone(phone: str) -> bool:
     """Enhanced phone validation with anomaly detection"""
     if not isinstance(phone, str):
         return False
-   
-    digits = re.sub(r"\D", "", phone)
+    return _is_valid_phone(phone)
+
+
+# Validation is pure, and uploads/CSV replays repeat the same values
+@lru_cache(maxsize=8192)
+def _is_valid_phone(phone: str) -> bool:
+    digits = _NON_DIGIT_RE.sub("", phone)
     
     if not (7 <= len(digits) <= 15):
         return False
@@ -76,14 +333,8 @@ def is_valid_phone(phone: str) -> bool:
     
     if is_sequential(digits):
         return False
-   
-    invalid_patterns = [
-        '0000000000', '1111111111', '2222222222', '3333333333',
-        '4444444444', '5555555555', '6666666666', '7777777777',
-        '8888888888', '9999999999', '1234567890', '0987654321'
-    ]
     
-    if digits in invalid_patterns:
+    if digits in INVALID_PHONE_PATTERNS:
         return False
     
     return True
@@ -93,7 +344,11 @@ def is_valid_email(email: str) -> bool:
     """Enhanced email validation with anomaly detection"""
     if not isinstance(email, str):
         return False
- 
+    return _is_valid_email(email)
+
+
+@lru_cache(maxsize=8192)
+def _is_valid_email(email: str) -> bool:
     if not EMAIL_RE.match(email):
         return False
     
@@ -130,19 +385,24 @@ def is_valid_email(email: str) -> bool:
     return True
 
 
+_ASCENDING_DIGITS = "0123456789"
+_DESCENDING_DIGITS = "9876543210"
+
+
 def is_sequential(digits: str) -> bool:
     """Check if digits are in sequential order"""
     if len(digits) < 4:
         return False
-    ascending = all(int(digits[i]) == int(digits[i-1]) + 1 for i in range(1, len(digits)))
-    descending = all(int(digits[i]) == int(digits[i-1]) - 1 for i in range(1, len(digits)))
-    
-    return ascending or descending
+    if not digits.isascii():
+        # \d also matches other scripts' digits (e.g. Arabic-Indic); map them to 0-9
+        digits = "".join(str(unicodedata.decimal(d)) for d in digits)
+    # A run of consecutive digits is exactly a substring of 0-9 (or 9-0)
+    return digits in _ASCENDING_DIGITS or digits in _DESCENDING_DIGITS
 
 
 def detect_anomalies(name: str, email: str, phone: str) -> dict:
     """Detect anomalies in user input data"""
-    anomalies = {
+    anomalies: Dict[str, Any] = {
         "has_anomaly": False,
         "anomaly_details": []
     }
@@ -0,0 +1,18 @@
+"""Optional native build of the redaction hot path.
+
+``pip install -e .`` compiles app/utils.py with mypyc (build requirements are
+pinned in pyproject.toml) and drops the extension next to it; Python then
+imports the compiled module ahead of the .py source. Without the build the app
+runs the pure-Python module unchanged.
+
+While the extension is there, edits to app/utils.py have no effect: rebuild,
+or delete app/utils*.so to go back to the source.
+"""
+from setuptools import setup
+from mypyc.build import mypycify
+
+setup(
+    name="pii-redactor",
+    packages=["app"],
+    ext_modules=mypycify(["app/utils.py"]),
+)
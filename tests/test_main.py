@@ -0,0 +1,35 @@
+import io
+
+from app import main
+
+
+def test_parallel_csv_redaction_matches_serial(monkeypatch):
+    rows = [f"{i},user{i}@example.com,+1 415 555 {i % 10000:04d},note {i}" for i in range(200)]
+    data = ("id,email,phone,notes\n" + "\n".join(rows) + "\n").encode("utf-8")
+    # Many small batches across two workers exercise ordering and back-pressure
+    monkeypatch.setattr(main, "CSV_BATCH_ROWS", 7)
+    monkeypatch.setattr(main, "REDACT_WORKERS", 2)
+    monkeypatch.setattr(main, "_redact_pool", None)
+    try:
+        parallel = b"".join(main._iter_redacted_csv(io.BytesIO(data), parallel=True))
+    finally:
+        if main._redact_pool is not None:
+            main._redact_pool.shutdown()
+    serial = b"".join(main._iter_redacted_csv(io.BytesIO(data), parallel=False))
+    assert parallel == serial
+    assert b"[REDACTED_EMAIL]" in serial
+
+
+def test_csv_header_row_is_not_redacted():
+    data = b"contact@example.com,555-123-4567\nuser@example.com,555-123-4567\n"
+    out = main._redact_csv(io.BytesIO(data)).read().decode("utf-8")
+    header, row = out.splitlines()
+    assert header == "contact@example.com,555-123-4567"
+    assert row == "[REDACTED_EMAIL],[REDACTED_PHONE]"
+
+
+def test_csv_field_over_default_size_limit():
+    notes = "x" * (200 * 1024) + " user@example.com"
+    data = f"id,notes\n1,{notes}\n".encode("utf-8")
+    out = main._redact_csv(io.BytesIO(data)).read().decode("utf-8")
+    assert out == "id,notes\n1," + "x" * (200 * 1024) + " [REDACTED_EMAIL]\n"
@@ -0,0 +1,68 @@
+import os
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app import storage
+
+
+@pytest.fixture
+def sqlite_db(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'metadata.sqlite'}")
+    monkeypatch.setattr(storage, "engine", None)
+    monkeypatch.setattr(storage, "SessionLocal", None)
+    storage._clear_report_caches()
+    yield
+    if storage.engine is not None:
+        storage.engine.dispose()
+    storage._clear_report_caches()
+
+
+def test_report_pages_through_rows_sharing_created_at(sqlite_db):
+    storage.init_database()
+    created_at = datetime(2024, 5, 1, 12, 0, 0)
+    with storage.SessionLocal.begin() as db:
+        db.add_all(
+            storage.MetadataRecord(upload_id=f"u{i}", created_at=created_at) for i in range(7)
+        )
+
+    seen = []
+    before = before_id = None
+    while True:
+        page = storage.get_all_uploads_with_anomalies(limit=3, before=before, before_id=before_id)
+        seen += [upload["id"] for upload in page]
+        if len(page) < 3:
+            break
+        before, before_id = datetime.fromisoformat(page[-1]["created_at"]), page[-1]["id"]
+
+    assert seen == [7, 6, 5, 4, 3, 2, 1]
+
+
+def test_fresh_schema_passes_boolean_check(sqlite_db):
+    storage.init_database()
+    assert storage.SessionLocal is not None
+    storage._migrate_boolean_columns(storage.engine)
+
+
+def test_legacy_string_flags_refuse_to_start(sqlite_db):
+    engine = create_engine(os.environ["DATABASE_URL"])
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE file_metadata (id INTEGER PRIMARY KEY, upload_id VARCHAR(32), "
+            "phone_valid VARCHAR(10), email_valid VARCHAR(10), anomaly VARCHAR(10), "
+            "created_at DATETIME DEFAULT CURRENT_TIMESTAMP)"
+        ))
+    engine.dispose()
+
+    with pytest.raises(storage.LegacySchemaError):
+        storage.init_database()
+
+
+def test_copy_to_path_streams_non_regular_files(tmp_path):
+    read_fd, write_fd = os.pipe()
+    os.write(write_fd, b"piped upload")
+    os.close(write_fd)
+    with os.fdopen(read_fd, "rb") as pipe:
+        storage._copy_to_path(pipe, tmp_path / "out")
+    assert (tmp_path / "out").read_bytes() == b"piped upload"
@@ -1,3 +1,8 @@
+import time
+
+import pytest
+
+from app import utils
 from app.utils import redact_text, is_valid_phone
 
 def test_redact_email():
@@ -11,3 +16,42 @@ def test_redact_phone():
 def test_is_valid_phone():
     assert is_valid_phone("+91 9876543210")
     assert not is_valid_phone("123")
+    assert not is_valid_phone("١٢٣٤٥٦٧٨")  # sequential, in Arabic-Indic digits
+
+@pytest.mark.skipif(utils._HS_DB is None, reason="hyperscan not installed")
+def test_redact_hyperscan_matches_regex():
+    s = "Mail a.b@example.com, call +1 (555) 123-4567, SSN 123-45-6789, DOB 1990-01-31, x1234567y"
+    assert utils._redact_hyperscan(s) == utils.MASTER.sub(utils._redact_match, s)
+
+@pytest.mark.skipif(utils._HS_DB is None, reason="hyperscan not installed")
+def test_redact_hyperscan_false_positive_before_long_address_run():
+    s = "x " + "1" * 30 + " " + "a." * 20000 + "@x"
+    start = time.perf_counter()
+    assert utils._redact_hyperscan(s) == s
+    assert time.perf_counter() - start < 1.0
+
+def test_redact_many_keeps_cells_separate():
+    cells = ["12345", "6789012", "a@b.com", "", "x\x00y"]
+    assert utils.redact_many(cells) == [redact_text(c) for c in cells]
+    assert utils.redact_many(cells[:3]) == [redact_text(c) for c in cells[:3]]
+
+@pytest.mark.skipif(utils._RE2_PRESCAN is None, reason="google-re2 not installed")
+def test_redact_re2_matches_regex():
+    s = "Café: é.b@example.com, tél +33 6 12 34 56 78, ٣٣٣-٢٢-١١١١, x1234567y"
+    assert utils._redact_re2(s) == utils.MASTER.sub(utils._redact_match, s)
+
+@pytest.mark.skipif(utils._RE2_PRESCAN is None, reason="google-re2 not installed")
+def test_redact_re2_long_digit_run_is_linear():
+    s = "é" + "1" * 80000
+    start = time.perf_counter()
+    assert utils._redact_re2(s) == utils.MASTER.sub(utils._redact_match, s)
+    assert time.perf_counter() - start < 1.0
+
+@pytest.mark.skipif(utils._RE2_PRESCAN is None, reason="google-re2 not installed")
+def test_redact_re2_false_positive_before_long_address_run():
+    # The digit run is a prescan candidate but not PII; what follows must not
+    # be handed to the backtracking email pattern
+    s = "é " + "1" * 30 + " " + "a." * 20000 + "@x"
+    start = time.perf_counter()
+    assert utils._redact_re2(s) == s
+    assert time.perf_counter() - start < 1.0